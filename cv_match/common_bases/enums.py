@@ -1,56 +1,49 @@
-class SimpleEnum:
+class _EnumMeta(type):
+    def __init__(cls, name, bases, namespace):
+        """Materialize display names, choices and values once, when the enum class is defined
+
+        :return:
+        """
+        super().__init__(name, bases, namespace)
+
+        members = {att: value for att, value in cls.__dict__.items() if att.isupper()}
+        display_names = {att: cls.__dict__.get(f"_{cls.__name__}__{att}") or att for att in members}
+
+        if not members and len(cls.__bases__) > 0:
+            # Without members of its own, the enum exposes the ones of its first base
+            base_cls = cls.__bases__[0]
+            members = {att: value for att, value in base_cls.__dict__.items() if att.isupper()}
+            display_names = {
+                att: (base_cls.__dict__.get(f"_{base_cls.__name__}__{att}")
+                      or cls.__dict__.get(f"_{cls.__name__}__{att}")
+                      or att)
+                for att in members
+            }
+
+        cls._display_names = display_names
+        cls._choices = tuple((value, display_names[att]) for att, value in members.items())
+        cls._reverse_choices = tuple((display, value) for value, display in cls._choices)
+        cls._values = tuple(value for att, value in cls.__dict__.items() if att.isupper())
+
+
+class SimpleEnum(metaclass=_EnumMeta):
     @classmethod
     def choices(cls, revert=False):
         """Get choices as a tuple of tuple
 
         :return:
         """
-        res = []
-        for att in cls.__dict__.keys():
-            if att.isupper():
-                value = cls.__dict__[att]
-                display = cls.get_display_name(att)
-                if revert:
-                    res.append((display, value))
-                else:
-                    res.append((value, display))
-
-        if res:
-            return res
-
-        if len(cls.__bases__) > 0:
-            base_cls = cls.__bases__[0]
-            for att in base_cls.__dict__.keys():
-                if att.isupper():
-                    value = base_cls.__dict__[att]
-                    display = base_cls.get_display_name(att, parent_cls=cls)
-                    if revert:
-                        res.append((display, value))
-                    else:
-                        res.append((value, display))
-        return res
+        return cls._reverse_choices if revert else cls._choices
 
     @classmethod
-    def get_display_name(cls, att_name, parent_cls=None):
+    def get_display_name(cls, att_name):
         """Get display name of an attribute
 
-        :param app_name:
+        :param att_name:
         :return:
         """
-        r = cls.__dict__.get(f"_{cls.__name__}__{att_name}")
-        if not r:
-            if parent_cls:
-                r = parent_cls.__dict__.get(f"_{parent_cls.__name__}__{att_name}")
-        if not r:
-            r = att_name
-
-        return r
+        return cls._display_names.get(att_name, att_name)
 
     @classmethod
     def values(cls):
-        res = []
-        for att in cls.__dict__.keys():
-            if att.isupper():
-                value = cls.__dict__[att]
-                res.append(value)
-        return res
+        return cls._values
@@ -0,0 +1,14 @@
+import logging
+
+from traceback_with_variables import format_exc
+
+
+def log_exception(logger: logging.Logger, message: str, exc: BaseException):
+    """Log an exception with its traceback
+
+    The variables of every frame are only dumped when debug logging is enabled, as collecting them is costly.
+    """
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.error(f'{message}\n{format_exc(exc)}')
+    else:
+        logger.error(message, exc_info=exc)
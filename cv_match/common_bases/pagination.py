@@ -15,3 +15,15 @@ class PaginationWithTotalPage(pagination.PageNumberPagination):
             'results': data
         })
         return response
+
+
+class CVMatchingCursorPagination(pagination.CursorPagination):
+    """
+        Keyset pagination for matchings: no COUNT(*) and constant cost whatever the page depth
+
+        The id breaks score ties so the order is stable, matching the (job_offer/cv, -score, id) indexes of CVMatching.
+    """
+    page_size_query_param = 'page_size'
+    page_size = 100
+    max_page_size = 500
+    ordering = ('-score', 'id')
@@ -0,0 +1,15 @@
+"""
+Celery config for cv_match project.
+
+Workers are started with ``celery -A cv_match worker -l info``.
+"""
+
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cv_match.settings')
+
+app = Celery('cv_match')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
@@ -78,6 +78,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'cv_match.wsgi.application'
+ASGI_APPLICATION = 'cv_match.asgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -135,6 +136,36 @@ EXTRACTION_MODEL_PROVIDER = os.getenv('EXTRACTION_MODEL_PROVIDER')
 EXTRACTION_MODEL = os.getenv('EXTRACTION_MODEL')
 OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
 
+# Maximum number of concurrent CV extractions when scoring many CVs at once
+SCORER_CONCURRENCY = int(os.getenv('SCORER_CONCURRENCY', '10'))
+
+# Maximum number of scoring LLM calls in flight at once (keep it in line with the provider rate limits,
+# or with OLLAMA_NUM_PARALLEL for a local Ollama)
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '8'))
+# CVs whose weighted deterministic score (0-70) is below this threshold are not sent to the LLM, 0 disables it
+LLM_MIN_PREFILTER_SCORE = float(os.getenv('LLM_MIN_PREFILTER_SCORE', '0'))
+
+# Use pdfplumber layout-preserving extraction instead of PyMuPDF for PDF CVs (slower)
+PDF_PRESERVE_LAYOUT = os.getenv('PDF_PRESERVE_LAYOUT', 'False').lower() == 'true'
+
+# LLM response cache: Redis when REDIS_URL is set, local SQLite file otherwise
+REDIS_URL = os.getenv('REDIS_URL')
+LANGCHAIN_CACHE_PATH = os.getenv('LANGCHAIN_CACHE_PATH', str(BASE_DIR / '.langchain.db'))
+
+# CELERY CONFIGURATION
+
+CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0')
+CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', CELERY_BROKER_URL)
+CELERY_TASK_SERIALIZER = 'json'
+CELERY_RESULT_SERIALIZER = 'json'
+CELERY_ACCEPT_CONTENT = ['json']
+CELERY_BEAT_SCHEDULE = {
+    'poll-scoring-batches': {
+        'task': 'matching.tasks.poll_batches',
+        'schedule': float(os.getenv('SCORING_BATCH_POLL_INTERVAL', '300')),
+    },
+}
+
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_FILTER_BACKENDS': [
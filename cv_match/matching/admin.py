@@ -3,6 +3,7 @@ from django.contrib import admin
 from matching.models import CV
 from matching.models import JobOffer
 from matching.models import CVMatching
+from matching.models import ScoringBatch
 
 
 @admin.register(JobOffer)
@@ -15,9 +16,21 @@ class JobOfferAdmin(admin.ModelAdmin):
 @admin.register(CV)
 class CVAdmin(admin.ModelAdmin):
     list_display = ('title', 'uploaded_at')
+    search_fields = ('title', 'name', 'email')
 
 
 @admin.register(CVMatching)
 class CVMatchingAdmin(admin.ModelAdmin):
-    list_display = ('job_offer', 'cv', 'score', 'evaluated_at')
-    list_filter = ('job_offer', 'cv')
+    list_display = ('job_offer', 'cv', 'score', 'status', 'evaluated_at')
+    # Only list the offers and CVs that actually have matchings, and search them instead of loading every row
+    list_filter = ('status', ('job_offer', admin.RelatedOnlyFieldListFilter), ('cv', admin.RelatedOnlyFieldListFilter))
+    autocomplete_fields = ('job_offer', 'cv')
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('job_offer', 'cv')
+
+
+@admin.register(ScoringBatch)
+class ScoringBatchAdmin(admin.ModelAdmin):
+    list_display = ('batch_id', 'status', 'submitted_at', 'completed_at')
+    list_filter = ('status',)
@@ -1,6 +1,26 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class MatchingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'matching'
+
+    def ready(self):
+        """
+            Connect the signals and install the global LangChain cache so identical LLM prompts are answered without
+            an API round-trip
+        """
+        from langchain_core.globals import set_llm_cache
+
+        from matching import signals  # noqa: F401
+
+        if settings.REDIS_URL:
+            import redis
+            from langchain_community.cache import RedisCache
+
+            set_llm_cache(RedisCache(redis.Redis.from_url(settings.REDIS_URL)))
+        else:
+            from langchain_community.cache import SQLiteCache
+
+            set_llm_cache(SQLiteCache(database_path=settings.LANGCHAIN_CACHE_PATH))
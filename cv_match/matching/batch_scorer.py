@@ -0,0 +1,163 @@
+import json
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.utils import timezone
+
+from openai import OpenAI
+
+from common_bases.logs import log_exception
+from matching.enums import BatchStatus
+from matching.models import CV
+from matching.models import JobOffer
+from matching.models import ScoringBatch
+from matching.scorer import GlobalScorer
+from matching.scorer import ScoringData
+from matching.scorer import persist_matchings
+
+logger = logging.getLogger(__name__)
+
+BATCH_ENDPOINT = '/v1/chat/completions'
+
+# Chat Completions role of each LangChain message type of the scoring prompt
+MESSAGE_ROLES = {'system': 'system', 'human': 'user', 'ai': 'assistant'}
+
+RESPONSE_FORMAT = {
+    'type': 'json_schema',
+    'json_schema': {'name': ScoringData.__name__, 'schema': ScoringData.model_json_schema(), 'strict': True},
+}
+
+
+def submit_batch(pairs: List[Tuple[JobOffer, CV]]) -> Optional[str]:
+    """
+        Submit the scoring of (job offer, already extracted CV) pairs to the OpenAI Batch API
+
+        Batches cost half the price of synchronous calls and are not subject to the real-time rate limits, but are
+        only guaranteed to complete within 24h. Results are saved by `poll_batches`.
+        Pairs below the pre-filter threshold are saved right away and not submitted, None is returned when no pair is
+        left to submit.
+    """
+    if settings.EXTRACTION_MODEL_PROVIDER != 'openai':
+        raise ValueError(f'Batch scoring is not supported for provider: {settings.EXTRACTION_MODEL_PROVIDER}')
+
+    requests = []
+    # Scores are saved under the cache keys of the CVs and offers as they are now, not as they are once the batch ends
+    cache_keys = {}
+    for offer, cv in pairs:
+        scorer = GlobalScorer(offer=offer, cv=cv)
+
+        prefiltered = scorer.prefilter()
+        if prefiltered:
+            scorer.save_matching(*prefiltered)
+            continue
+
+        custom_id = f'{offer.id}:{cv.id}'
+        cache_keys[custom_id] = scorer.cache_key
+        requests.append(json.dumps({
+            'custom_id': custom_id,
+            'method': 'POST',
+            'url': BATCH_ENDPOINT,
+            'body': {
+                'model': settings.EXTRACTION_MODEL,
+                'temperature': 0,
+                'messages': [{'role': MESSAGE_ROLES[message.type], 'content': message.content}
+                             for message in scorer.scoring_messages()],
+                'response_format': RESPONSE_FORMAT,
+            },
+        }))
+
+    if not requests:
+        logger.info(f'All the {len(pairs)} pairs were pre-filtered, no scoring batch submitted')
+        return None
+
+    client = OpenAI()
+    input_file = client.files.create(file=('scoring_batch.jsonl', '\n'.join(requests).encode()), purpose='batch')
+    batch = client.batches.create(input_file_id=input_file.id, endpoint=BATCH_ENDPOINT, completion_window='24h')
+
+    ScoringBatch.objects.create(batch_id=batch.id, cache_keys=cache_keys)
+    logger.info(f'Submitted scoring batch {batch.id} with {len(requests)} requests')
+
+    return batch.id
+
+
+def _parse_record(record: Dict) -> Optional[Tuple[int, int, Dict]]:
+    """
+        (offer id, CV id, score details) of a batch output record, None when its request failed
+
+        Raises when the record is malformed, e.g. a refusal without content or a truncated JSON answer.
+    """
+    response = record.get('response') or {}
+
+    if record.get('error') or response.get('status_code') != 200:
+        logger.warning(f'Scoring request {record.get("custom_id")} failed: {record}')
+        return None
+
+    offer_id, cv_id = (int(identifier) for identifier in record['custom_id'].split(':'))
+    message = response['body']['choices'][0]['message']
+    if not message.get('content'):
+        raise ValueError(f'No content in the answer to {record["custom_id"]}: {message.get("refusal")}')
+
+    return offer_id, cv_id, ScoringData.model_validate_json(message['content']).model_dump()
+
+
+def _close_batch(scoring_batch: ScoringBatch, status: str):
+    scoring_batch.status = status
+    scoring_batch.completed_at = timezone.now()
+    scoring_batch.save(update_fields=['status', 'completed_at'])
+
+
+def poll_batches():
+    """
+        Save the matchings of every submitted batch that completed since the last poll
+
+        Invalid records are logged and skipped, so they never block the rest of the batch nor the next batches.
+    """
+    client = OpenAI()
+
+    for scoring_batch in ScoringBatch.objects.filter(status=BatchStatus.SUBMITTED):
+        batch = client.batches.retrieve(scoring_batch.batch_id)
+
+        if batch.status in ('failed', 'expired', 'cancelled'):
+            logger.error(f'Scoring batch {batch.id} ended with status {batch.status}')
+            _close_batch(scoring_batch, BatchStatus.FAILED)
+            continue
+
+        if batch.status != 'completed':
+            continue
+
+        if not batch.output_file_id:
+            # Only the error file is produced when every request failed
+            logger.error(f'Scoring batch {batch.id} has no output, see its error file {batch.error_file_id}')
+            _close_batch(scoring_batch, BatchStatus.FAILED)
+            continue
+
+        parsed = []
+        for line in client.files.content(batch.output_file_id).text.splitlines():
+            try:
+                record = _parse_record(json.loads(line))
+            except Exception as e:
+                log_exception(logger, f'Skipping an invalid record of scoring batch {batch.id}', e)
+                continue
+
+            if record:
+                parsed.append(record)
+
+        # CVs and offers may have been deleted while the batch was running
+        offer_ids = set(JobOffer.objects.filter(pk__in={offer_id for offer_id, _, _ in parsed})
+                        .values_list('pk', flat=True))
+        cv_ids = set(CV.objects.filter(pk__in={cv_id for _, cv_id, _ in parsed}).values_list('pk', flat=True))
+        results = [
+            (cv_id, offer_id, GlobalScorer.weighted_score(score_details), score_details,
+             scoring_batch.cache_keys.get(f'{offer_id}:{cv_id}', ''))
+            for offer_id, cv_id, score_details in parsed
+            if offer_id in offer_ids and cv_id in cv_ids
+        ]
+        if len(results) < len(parsed):
+            logger.warning(f'Skipped {len(parsed) - len(results)} results of scoring batch {batch.id} '
+                           f'whose CV or job offer was deleted')
+
+        matchings = persist_matchings(results)
+
+        _close_batch(scoring_batch, BatchStatus.COMPLETED)
+        logger.info(f'Saved {len(matchings)} matchings from scoring batch {batch.id}')
@@ -11,3 +11,15 @@ class WorkType(SimpleEnum):
     ON_SITE = 'ON_SITE'
     HYBRID = 'HYBRID'
     REMOTE = 'REMOTE'
+
+
+class BatchStatus(SimpleEnum):
+    SUBMITTED = 'SUBMITTED'
+    COMPLETED = 'COMPLETED'
+    FAILED = 'FAILED'
+
+
+class MatchingStatus(SimpleEnum):
+    PENDING = 'PENDING'
+    COMPLETED = 'COMPLETED'
+    FAILED = 'FAILED'
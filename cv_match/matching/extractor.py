@@ -1,19 +1,20 @@
+import hashlib
 import logging
+from functools import cached_property
 from pathlib import Path
 from typing import Optional, List
 from pydantic import BaseModel, Field
 
 from django.conf import settings
 
-from langchain_openai import ChatOpenAI
-from langchain_anthropic import ChatAnthropic
-from langchain_community.chat_models import ChatOllama
-
 import mammoth
 import pdfplumber
-from traceback_with_variables import format_exc
+import pymupdf
 
+from common_bases.logs import log_exception
+from matching.llm import get_structured_llm
 from matching.models import CV
+from matching.skills import normalize_skills
 
 logger = logging.getLogger(__name__)
 
@@ -48,6 +49,7 @@ class Extractor(object):
         self.email: Optional[str] = None
         self.description: Optional[str] = None
         self.skills: List = []
+        self.skills_normalized: List[str] = []
         self.diploma: Optional[str] = None
         self.diploma_ranking: Optional[int] = None
         self.year_experience: Optional[int] = None
@@ -55,12 +57,42 @@ class Extractor(object):
         self.languages: List[str] = []
         self.certifications: List[str] = []
         self.raw_text: Optional[str] = None
+        self.extraction_hash: str = ''
+
+    @cached_property
+    def skills_normalized_set(self) -> frozenset[str]:
+        """
+            Canonical candidate skills, built once so scoring against many offers reuses them
+        """
+        return frozenset(self.skills_normalized)
+
+    def _reset_cache(self):
+        """
+            Drop the values derived from the extracted data, to call whenever that data is (re)loaded
+        """
+        self.__dict__.pop('skills_normalized_set', None)
+
+    def file_hash(self) -> str:
+        """
+            SHA-256 of the CV file, identifying the file the data is extracted from
+        """
+        with open(self.cv.file.path, 'rb') as cv_file:
+            return hashlib.file_digest(cv_file, 'sha256').hexdigest()
 
     def extract_raw(self) -> Optional[str]:
         """
             This function returns the raw text from the CV
+
+            The text saved on the CV is reused as long as the file did not change since it was extracted.
         """
         cv_path = Path(self.cv.file.path)
+        if not self.extraction_hash:
+            self.extraction_hash = self.file_hash()
+
+        if self.cv.raw_text and self.cv.extraction_hash == self.extraction_hash:
+            logger.info(f'Reusing the raw text already extracted from {cv_path.name}')
+            return self.cv.raw_text
+
         raw_text = ''
 
         if cv_path.suffix in ['.docx', '.doc', '.DOCX', '.DOC']:
@@ -77,13 +109,35 @@ class Extractor(object):
     def _extract_raw_pdf(self) -> str:
         """
             This function returns the raw text from a PDF CV
+
+            PyMuPDF (MuPDF C backend) is used by default, pdfplumber only when layout has to be preserved.
+        """
+        if settings.PDF_PRESERVE_LAYOUT:
+            return self._extract_raw_pdf_layout()
+
+        with pymupdf.open(self.cv.file.path) as pdf:
+            pages_text = [page.get_text('text') for page in pdf]
+
+        raw_text = []
+        for page_number, page_text in enumerate(pages_text, start=1):
+            if page_text.strip():
+                raw_text.append(page_text)
+            else:
+                logger.warning(f'Cannot extract text from PDF page {page_number}')
+
+        return '\n'.join(raw_text).strip()
+
+    def _extract_raw_pdf_layout(self) -> str:
+        """
+            This function returns the raw text from a PDF CV, keeping the page layout
         """
         with pdfplumber.open(self.cv.file.path) as pdf:
             raw_text = []
 
             for page in pdf.pages:
-                if page.extract_text():
-                    raw_text.append(page.extract_text())
+                page_text = page.extract_text(layout=True)
+                if page_text:
+                    raw_text.append(page_text)
                 else:
                     logger.warning(f'Cannot extract text from PDF page {page.page_number}')
 
@@ -116,23 +170,20 @@ class Extractor(object):
             - year_experience: Optional[int] = None
             - experiences: List[str] = None
             - languages: Optional[str] = None
+
+            The LLM is not called again when the data of the same file is already saved on the CV.
         """
 
         try:
-            if settings.EXTRACTION_MODEL_PROVIDER == 'openai':
-                llm = ChatOpenAI(model=settings.EXTRACTION_MODEL, temperature=0)
-
-            elif settings.EXTRACTION_MODEL_PROVIDER == 'anthropic':
-                llm = ChatAnthropic(model=settings.EXTRACTION_MODEL, temperature=0)
-
-            elif settings.EXTRACTION_MODEL_PROVIDER == 'ollama':
-                llm = ChatOllama(model=settings.EXTRACTION_MODEL, temperature=0)
-
-            else:
-                logger.warning(f'Unsupported model provider: {settings.EXTRACTION_MODEL_PROVIDER}')
+            self.extraction_hash = self.file_hash()
+            if self.cv.is_extracted and self.cv.extraction_hash == self.extraction_hash:
+                logger.info(f'Reusing the data already extracted from CV {self.cv.pk}')
+                self.load_from_model()
                 return
 
-            structured_llm = llm.with_structured_output(CVData)
+            structured_llm = get_structured_llm(CVData)
+            if not structured_llm:
+                return
 
             prompt = (
                 """
@@ -167,28 +218,43 @@ Raw CV text:
             self.email = result.email
             self.description = result.description
             self.skills = result.skills
+            self.skills_normalized = normalize_skills(result.skills)
             self.diploma = result.diploma
             self.diploma_ranking = result.diploma_ranking
             self.year_experience = result.year_experience
             self.experiences = result.experiences
             self.languages = result.languages
+            self._reset_cache()
 
             self.save()
 
         except Exception as e:
-            logger.error(format_exc(e))
+            log_exception(logger, f'Unable to extract CV {self.cv.pk}', e)
             raise ValueError(e) from e
 
-    def to_dict(self):
-        return {
-            'description': self.description,
-            'skills': ', '.join(self.skills),
-            'diploma': self.diploma,
-            'year_experience': self.year_experience,
-            'experiences': ', '.join(self.experiences),
-            'languages': ', '.join(self.languages),
-            'certifications': ', '.join(self.certifications)
-        }
+    def load_from_model(self):
+        """
+            Hydrate the extractor from the data already extracted and saved on the CV
+        """
+        if not self.cv.is_extracted:
+            raise ValueError(f'CV {self.cv.pk} has not been extracted yet')
+
+        self.name = self.cv.name
+        self.website = self.cv.website
+        self.phone_number = self.cv.phone_number
+        self.email = self.cv.email
+        self.description = self.cv.description
+        self.skills = [skill.strip() for skill in self.cv.skills.split(',') if skill.strip()]
+        self.skills_normalized = self.cv.skills_normalized or normalize_skills(self.skills)
+        self.diploma = self.cv.diploma
+        self.diploma_ranking = self.cv.diploma_ranking
+        self.year_experience = self.cv.year_experience
+        self.experiences = self.cv.experiences or []
+        self.languages = [language.strip() for language in self.cv.languages.split(',') if language.strip()]
+        self.certifications = self.cv.certifications or []
+        self.raw_text = self.cv.raw_text
+        self.extraction_hash = self.cv.extraction_hash
+        self._reset_cache()
 
     def save(self):
         """
@@ -200,6 +266,7 @@ Raw CV text:
         self.cv.email = self.email
         self.cv.description = self.description
         self.cv.skills = ', '.join(self.skills)
+        self.cv.skills_normalized = self.skills_normalized
         self.cv.diploma = self.diploma
         self.cv.diploma_ranking = self.diploma_ranking
         self.cv.year_experience = self.year_experience
@@ -207,5 +274,6 @@ Raw CV text:
         self.cv.languages = ', '.join(self.languages)
         self.cv.certifications = self.certifications
         self.cv.raw_text = self.raw_text
+        self.cv.extraction_hash = self.extraction_hash
 
-        self.cv.save()
+        self.cv.save(update_fields=[*CV.EXTRACTED_FIELDS, 'updated_at'])
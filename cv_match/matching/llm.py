@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import threading
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import AsyncContextManager, AsyncIterator, Dict, Optional, Type
+
+from pydantic import BaseModel
+
+import httpx
+
+from django.conf import settings
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.runnables import Runnable
+
+from langchain_openai import ChatOpenAI
+from langchain_anthropic import ChatAnthropic
+from langchain_ollama import ChatOllama
+
+logger = logging.getLogger(__name__)
+
+# Provider-native structured output: the model is constrained to the schema instead of being re-asked on invalid JSON
+STRUCTURED_OUTPUT_OPTIONS = {
+    'openai': {'method': 'json_schema', 'strict': True},
+    'anthropic': {'method': 'function_calling'},
+    'ollama': {'method': 'json_schema'},
+}
+
+
+# Pooled connections to the provider API, shared by every sync call of the process and by the concurrent async calls
+# of an event loop
+HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=100)
+HTTP_TIMEOUT = httpx.Timeout(60.0, connect=5.0)
+
+
+class LoopScopedTransport(httpx.AsyncBaseTransport):
+    """
+        Async transport keeping one connection pool per event loop, for the duration of the calls made on it
+
+        Pooled connections belong to the loop that opened them, while the cached chat model outlives the loops it is
+        called from (`score_many` gets a new one from `async_to_sync` on every call). Async calls are made within
+        `scope()`, and the pool of a loop is closed when its last scope exits, before the loop itself can be closed.
+    """
+
+    def __init__(self):
+        self._transports: Dict[asyncio.AbstractEventLoop, httpx.AsyncHTTPTransport] = {}
+        self._scopes: Dict[asyncio.AbstractEventLoop, int] = {}
+        self._lock = threading.Lock()
+
+    def _loop_transport(self) -> httpx.AsyncHTTPTransport:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            transport = self._transports.get(loop)
+            if transport is None:
+                transport = httpx.AsyncHTTPTransport(http2=True, limits=HTTP_LIMITS)
+                self._transports[loop] = transport
+        return transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._loop_transport().handle_async_request(request)
+
+    @asynccontextmanager
+    async def scope(self) -> AsyncIterator[None]:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._scopes[loop] = self._scopes.get(loop, 0) + 1
+        try:
+            yield
+        finally:
+            transport = None
+            with self._lock:
+                self._scopes[loop] -= 1
+                if not self._scopes[loop]:
+                    del self._scopes[loop]
+                    transport = self._transports.pop(loop, None)
+            if transport is not None:
+                await transport.aclose()
+
+    async def aclose(self) -> None:
+        transport = self._transports.pop(asyncio.get_running_loop(), None)
+        if transport is not None:
+            await transport.aclose()
+
+
+ASYNC_TRANSPORT = LoopScopedTransport()
+
+
+def async_http_pool() -> AsyncContextManager[None]:
+    """
+        Scope of async LLM calls, the connections they open are closed once the last scope of the loop exits
+    """
+    return ASYNC_TRANSPORT.scope()
+
+
+@lru_cache(maxsize=None)
+def _build_llm(provider: str, model: str) -> Optional[BaseChatModel]:
+    """
+        Build the chat model of a provider, once per (provider, model)
+
+        OpenAI clients share one sync HTTP/2 connection pool, and one async pool per event loop (see
+        `async_http_pool`): connections (and TLS sessions) are kept alive across calls and concurrent scorings are
+        multiplexed on them instead of each opening its own.
+    """
+    if provider == 'openai':
+        return ChatOpenAI(model=model, temperature=0,
+                          http_client=httpx.Client(http2=True, limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT),
+                          http_async_client=httpx.AsyncClient(transport=ASYNC_TRANSPORT, timeout=HTTP_TIMEOUT))
+
+    if provider == 'anthropic':
+        return ChatAnthropic(model=model, temperature=0)
+
+    if provider == 'ollama':
+        return ChatOllama(model=model, temperature=0)
+
+    logger.warning(f'Unsupported model provider: {provider}')
+    return None
+
+
+def get_llm() -> Optional[BaseChatModel]:
+    """
+        Return the chat model of the configured provider
+    """
+    return _build_llm(settings.EXTRACTION_MODEL_PROVIDER, settings.EXTRACTION_MODEL)
+
+
+@lru_cache(maxsize=None)
+def _build_structured_llm(provider: str, model: str, schema: Type[BaseModel], include_raw: bool) -> Optional[Runnable]:
+    """
+        Bind the chat model of a provider to an output schema, once per (provider, model, schema, include_raw)
+
+        Binding converts the Pydantic schema to a JSON schema or tool definition (see `STRUCTURED_OUTPUT_OPTIONS`).
+    """
+    llm = _build_llm(provider, model)
+    if not llm:
+        return None
+
+    options = STRUCTURED_OUTPUT_OPTIONS.get(provider, {})
+    return llm.with_structured_output(schema, include_raw=include_raw, **options)
+
+
+def get_structured_llm(schema: Type[BaseModel], include_raw: bool = False) -> Optional[Runnable]:
+    """
+        Return the chat model of the configured provider bound to the given output schema
+
+        With `include_raw`, the runnable returns a dict with the `raw` message (e.g. for its usage metadata),
+        the `parsed` output and the `parsing_error`.
+    """
+    return _build_structured_llm(settings.EXTRACTION_MODEL_PROVIDER, settings.EXTRACTION_MODEL, schema, include_raw)
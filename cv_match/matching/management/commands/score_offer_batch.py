@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from matching.batch_scorer import submit_batch
+from matching.extractor import Extractor
+from matching.models import CV
+from matching.models import JobOffer
+
+
+class Command(BaseCommand):
+    help = 'Re-score every uploaded CV against a job offer through the provider Batch API (results within 24h)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--offer-id', type=int, required=True, help='Identifier of the job offer to score')
+
+    def handle(self, *args, **options):
+        try:
+            offer = JobOffer.objects.get(pk=options['offer_id'])
+        except JobOffer.DoesNotExist as e:
+            raise CommandError(f'Job offer {options["offer_id"]} does not exist') from e
+
+        cvs = list(CV.objects.exclude(file='').order_by('id'))
+        for cv in cvs:
+            if not cv.is_extracted:
+                self.stdout.write(f'Extracting CV {cv.id}...')
+                Extractor(cv).semantic_extract()
+
+        batch_id = submit_batch([(offer, cv) for cv in cvs])
+        if not batch_id:
+            self.stdout.write(self.style.SUCCESS(f'All the CVs were pre-filtered for offer {offer.id}, nothing to submit'))
+            return
+
+        self.stdout.write(self.style.SUCCESS(f'Submitted batch {batch_id} scoring {len(cvs)} CVs for offer {offer.id}'))
@@ -0,0 +1,18 @@
+import numpy as np
+
+from django.core.management.base import BaseCommand
+
+from matching.prefilter import cosine_similarities
+
+
+class Command(BaseCommand):
+    help = 'Compile the Numba functions of the pre-filter once so workers load them from the on-disk cache'
+
+    def handle(self, *args, **options):
+        # Numba compiles per argument types, so the dtypes/dimensions must match the ones used at runtime
+        candidates = np.ones((2, 4096), dtype=np.float32)
+        reference = np.ones(4096, dtype=np.float32)
+
+        cosine_similarities(candidates, reference)
+
+        self.stdout.write(self.style.SUCCESS(f'Compiled and cached: {cosine_similarities.__name__}'))
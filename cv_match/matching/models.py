@@ -1,14 +1,33 @@
+import hashlib
+import json
+import re
+from functools import cached_property
+from typing import List
+
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
 
+from matching.enums import BatchStatus
 from matching.enums import WorkType
 from matching.enums import ContractType
+from matching.enums import MatchingStatus
+from matching.skills import normalize_skills
+
+# Each experience sent to the scoring prompt is cut to its first sentences
+SCORING_EXPERIENCE_SENTENCES = 3
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+
+def _first_sentences(text: str, count: int) -> str:
+    return ' '.join(_SENTENCE_END.split(text.strip(), maxsplit=count)[:count])
 
 
 class JobOffer(models.Model):
     title: models.CharField = models.CharField(max_length=200)
     description: models.TextField = models.TextField()
     required_skills: models.CharField = models.TextField(help_text='Enter a comma-separated list of skills')
+    required_skills_normalized: models.JSONField = models.JSONField(default=list, blank=True, editable=False,
+                                                                    help_text='Canonical names of the required skills')
     company_name: models.CharField = models.CharField(max_length=200)
     location: models.CharField = models.CharField(max_length=200)
     start_date: models.DateField = models.DateField(blank=True, null=True)
@@ -24,10 +43,61 @@ class JobOffer(models.Model):
     updated_at: models.DateTimeField = models.DateTimeField(auto_now=True)
     expires_at: models.DateTimeField = models.DateTimeField(blank=True, null=True)
     is_expired: models.BooleanField = models.BooleanField(default=False)
+    signature_hash: models.CharField = models.CharField(max_length=64, blank=True, editable=False,
+                                                        help_text='SHA-256 of the fields the scoring depends on')
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        self.required_skills_normalized = normalize_skills(self.required_skills.split(','))
+        self.__dict__.pop('required_skills_normalized_set', None)
+        self.signature_hash = self.compute_signature_hash()
+        self.__dict__.pop('current_signature_hash', None)
+
+        super().save(*args, **kwargs)
+
+    def _normalized_required_skills(self) -> List[str]:
+        """
+            Stored canonical skills, or computed ones for rows written without save() (legacy rows, update, bulk_create)
+        """
+        return self.required_skills_normalized or normalize_skills(self.required_skills.split(','))
+
+    @cached_property
+    def required_skills_normalized_set(self) -> frozenset[str]:
+        return frozenset(self._normalized_required_skills())
+
+    @cached_property
+    def current_signature_hash(self) -> str:
+        """
+            Stored signature hash, or the computed one when the row was written without save()
+        """
+        return self.signature_hash or self.compute_signature_hash()
+
+    def compute_signature_hash(self) -> str:
+        """
+            Hash of everything the scoring reads from the offer, it only changes when the matchings must be re-scored
+        """
+        signature = {
+            **self.scoring_dict(),
+            'required_skills_normalized': self._normalized_required_skills(),
+        }
+        return hashlib.sha256(json.dumps(signature, sort_keys=True, default=str).encode()).hexdigest()
+
+    def scoring_dict(self):
+        """
+            Only the offer fields the scoring prompt refers to
+        """
+        return {
+            'title': self.title,
+            'description': self.description,
+            'required_skills': self.required_skills,
+            'required_languages': self.required_languages,
+            'required_diploma': self.required_diploma,
+            'required_diploma_ranking': self.required_diploma_ranking,
+            'required_experience': self.required_experience,
+        }
+
     def to_dict(self):
         return {
             'title': self.title,
@@ -46,6 +116,9 @@ class JobOffer(models.Model):
     class Meta:
         verbose_name = 'Job Offer'
         verbose_name_plural = 'Job Offers'
+        indexes = [
+            models.Index(fields=['is_expired', '-created_at']),
+        ]
 
 
 class CV(models.Model):
@@ -62,6 +135,8 @@ class CV(models.Model):
     email: models.CharField = models.CharField(max_length=255, help_text='Candidate email', blank=True)
     description: models.TextField = models.TextField(blank=True, help_text="Candidate's bio")
     skills: models.TextField = models.TextField(blank=True, help_text="Candidate's skills in comma-separated values")
+    skills_normalized: models.JSONField = models.JSONField(default=list, blank=True,
+                                                           help_text="Canonical names of the candidate's skills")
     diploma: models.TextField = models.TextField(blank=True, help_text="Candidate's diplomas")
     diploma_ranking: models.IntegerField = models.IntegerField(blank=True, null=True)
     certifications: models.JSONField = models.JSONField(blank=True, null=True)
@@ -69,10 +144,46 @@ class CV(models.Model):
     experiences: models.JSONField = models.JSONField(blank=True, null=True, help_text="Candidate's summarized experiences")
     languages: models.TextField = models.TextField(blank=True, help_text="Candidate's languages")
     raw_text: models.TextField = models.TextField(blank=True, null=True)
+    extraction_hash: models.CharField = models.CharField(max_length=64, blank=True,
+                                                         help_text='SHA-256 of the file the data was extracted from')
+
+    # Fields filled by the extraction, saved together and cleared when the file changes
+    EXTRACTED_FIELDS = ('name', 'website', 'phone_number', 'email', 'description', 'skills', 'skills_normalized',
+                        'diploma', 'diploma_ranking', 'certifications', 'year_experience', 'experiences', 'languages',
+                        'raw_text', 'extraction_hash')
 
     def __str__(self):
         return self.title
 
+    @property
+    def is_extracted(self) -> bool:
+        """
+            Whether the structured data of the current file is already saved on the CV
+        """
+        return bool(self.extraction_hash and self.raw_text and self.year_experience is not None)
+
+    def scoring_dict(self):
+        """
+            Only the candidate fields the scoring prompt refers to, experiences are cut to keep the prompt short
+        """
+        return {
+            'skills': self.skills,
+            'diploma': self.diploma,
+            'diploma_ranking': self.diploma_ranking,
+            'year_experience': self.year_experience,
+            'experiences': [_first_sentences(experience, SCORING_EXPERIENCE_SENTENCES)
+                            for experience in self.experiences or []],
+            'languages': self.languages,
+            'certifications': self.certifications or [],
+        }
+
+    def reset_extraction(self):
+        """
+            Clear the extracted data, so it is extracted again on the next scoring
+        """
+        for field_name in self.EXTRACTED_FIELDS:
+            setattr(self, field_name, self._meta.get_field(field_name).get_default())
+
     class Meta:
         verbose_name = 'CV'
         verbose_name_plural = 'CVs'
@@ -82,8 +193,16 @@ class CVMatching(models.Model):
     job_offer: models.ForeignKey = models.ForeignKey(JobOffer, on_delete=models.CASCADE, related_name='matchings')
     cv: models.ForeignKey = models.ForeignKey(CV, on_delete=models.CASCADE, related_name='matchings')
     evaluated_at: models.DateTimeField = models.DateTimeField(auto_now_add=True)
-    score: models.FloatField = models.FloatField(validators=[MinValueValidator(0.0), MaxValueValidator(100.0)])
-    score_description: models.JSONField = models.JSONField()
+    score: models.FloatField = models.FloatField(blank=True, null=True,
+                                                 validators=[MinValueValidator(0.0), MaxValueValidator(100.0)],
+                                                 help_text='Empty until the first scoring completes')
+    score_description: models.JSONField = models.JSONField(default=dict)
+    status: models.CharField = models.CharField(max_length=255, choices=MatchingStatus.choices,
+                                                default=MatchingStatus.COMPLETED)
+    task_id: models.CharField = models.CharField(max_length=255, blank=True,
+                                                 help_text='Identifier of the last scoring task')
+    cache_key: models.CharField = models.CharField(max_length=64, blank=True,
+                                                   help_text='Identifies the CV, offer and prompt the score comes from')
 
     def __str__(self):
         return f'{self.cv} scored {self.score} on Job offer {self.job_offer}'
@@ -91,3 +210,27 @@ class CVMatching(models.Model):
     class Meta:
         verbose_name = 'Matching'
         verbose_name_plural = 'Matchings'
+        constraints = [
+            models.UniqueConstraint(fields=['job_offer', 'cv'], name='unique_matching_per_job_offer_and_cv'),
+        ]
+        indexes = [
+            models.Index(fields=['job_offer', '-score', 'id']),
+            models.Index(fields=['cv', '-score', 'id']),
+        ]
+
+
+class ScoringBatch(models.Model):
+    batch_id: models.CharField = models.CharField(max_length=255, unique=True, help_text='Provider batch identifier')
+    status: models.CharField = models.CharField(max_length=255, choices=BatchStatus.choices,
+                                                default=BatchStatus.SUBMITTED)
+    submitted_at: models.DateTimeField = models.DateTimeField(auto_now_add=True)
+    completed_at: models.DateTimeField = models.DateTimeField(blank=True, null=True)
+    cache_keys: models.JSONField = models.JSONField(default=dict, blank=True,
+                                                    help_text='Matching cache key of each request, as of the submission')
+
+    def __str__(self):
+        return f'Scoring batch {self.batch_id} ({self.status})'
+
+    class Meta:
+        verbose_name = 'Scoring Batch'
+        verbose_name_plural = 'Scoring Batches'
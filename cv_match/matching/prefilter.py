@@ -0,0 +1,72 @@
+import logging
+from typing import List
+
+import numpy as np
+from numba import njit
+from sklearn.feature_extraction.text import HashingVectorizer
+
+from matching.models import CV
+from matching.models import JobOffer
+
+logger = logging.getLogger(__name__)
+
+# Stateless, so one instance can be shared by every request and worker thread
+_VECTORIZER = HashingVectorizer(n_features=4096, alternate_sign=False, norm=None)
+
+
+# Not parallel: without TBB Numba uses its workqueue threading layer, which aborts the process when request threads
+# call the kernel concurrently, and an (N, 4096) dot product is fast enough on one core
+@njit(cache=True)
+def cosine_similarities(candidates: np.ndarray, reference: np.ndarray) -> np.ndarray:
+    """
+        Cosine similarity of each row of `candidates` (N, F) with `reference` (F,)
+    """
+    similarities = np.zeros(candidates.shape[0], dtype=np.float32)
+
+    reference_norm = np.sqrt(np.sum(reference * reference))
+    if reference_norm == 0:
+        return similarities
+
+    for i in range(candidates.shape[0]):
+        dot = 0.0
+        norm = 0.0
+        for j in range(candidates.shape[1]):
+            dot += candidates[i, j] * reference[j]
+            norm += candidates[i, j] * candidates[i, j]
+
+        if norm > 0:
+            similarities[i] = dot / (np.sqrt(norm) * reference_norm)
+
+    return similarities
+
+
+def _vectorize(texts: List[str]) -> np.ndarray:
+    return _VECTORIZER.transform(texts).toarray().astype(np.float32)
+
+
+def _cv_text(cv: CV) -> str:
+    # CVs that were never extracted only have their raw text, if any
+    if cv.skills:
+        return f'{cv.skills} {cv.description}'
+
+    return cv.raw_text or ''
+
+
+def rank_candidates(offer: JobOffer, cvs: List[CV], top_k: int) -> List[CV]:
+    """
+        Return the `top_k` CVs the most similar to the offer, best first
+
+        This is a cheap lexical pre-filter meant to pick the CVs worth an LLM scoring.
+    """
+    if len(cvs) <= top_k:
+        return list(cvs)
+
+    reference = _vectorize([f'{offer.required_skills} {offer.description}'])[0]
+    candidates = _vectorize([_cv_text(cv) for cv in cvs])
+
+    similarities = cosine_similarities(candidates, reference)
+    ranking = np.argsort(-similarities, kind='stable')[:top_k]
+
+    logger.info(f'Pre-filter kept {top_k}/{len(cvs)} CVs for offer {offer.pk}')
+
+    return [cvs[index] for index in ranking]
@@ -1,35 +1,113 @@
+import asyncio
+import hashlib
+import json
 import logging
-from typing import Dict, List, Tuple
-from pydantic import BaseModel, Field
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from functools import lru_cache
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+from pydantic import BaseModel, ConfigDict, Field
 
-from django.conf import settings
-
-from langchain_openai import ChatOpenAI
-from langchain_anthropic import ChatAnthropic
-from langchain_community.chat_models import ChatOllama
+import numpy as np
 
-from traceback_with_variables import format_exc
+from asgiref.sync import async_to_sync
 
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from langchain_core.messages import BaseMessage
+from langchain_core.messages import SystemMessage
+from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import Runnable
+
+from common_bases.logs import log_exception
+from matching.llm import async_http_pool
+from matching.llm import get_llm
+from matching.llm import get_structured_llm
+from matching.enums import MatchingStatus
 from matching.models import CV
+from matching.models import CVMatching
 from matching.models import JobOffer
 
 from matching.extractor import Extractor
 
 logger = logging.getLogger(__name__)
 
+WEIGHTS = {
+    'experience': 0.25,
+    'skills': 0.35,
+    'education': 0.10,
+    'languages': 0.10,
+    'job_fit': 0.20,
+}
+
+# LLM scores combined into the global score, WEIGHT_VEC holds their weights in the same order
+SCORE_FIELDS = ('experience', 'skills', 'education', 'languages', 'job_fit')
+WEIGHT_VEC = np.array([WEIGHTS[field] for field in SCORE_FIELDS], dtype=np.float64)
+
+# Bump whenever the scoring prompts, schema or weights change, so the stored matchings are not reused anymore
+PROMPT_VERSION = 2
+
+
+def matching_cache_key(extraction_hash: str, signature_hash: str) -> str:
+    """
+        Key of a score: the same extracted CV file, offer signature and prompt version always give the same score
+    """
+    return hashlib.sha256(f'{extraction_hash}:{signature_hash}:{PROMPT_VERSION}'.encode()).hexdigest()
+
+
+def stored_cache_key(score_details: Dict, cache_key: str) -> str:
+    """
+        Cache key to store with a score: none for prefiltered scores, which also depend on LLM_MIN_PREFILTER_SCORE
+        and must not be reused once the threshold changes
+    """
+    return '' if score_details.get('prefiltered') else cache_key
+
+
+def persist_matchings(results: List[Tuple[int, int, float, Dict, str]]) -> List[CVMatching]:
+    """
+        Save many (CV id, job offer id, score, score details, cache key) results as completed matchings
+
+        A single INSERT ... ON CONFLICT DO UPDATE instead of one update_or_create per matching.
+    """
+    evaluation_time = timezone.now()
+    matchings = [
+        CVMatching(
+            job_offer_id=job_offer_id,
+            cv_id=cv_id,
+            score=score_value,
+            score_description=score_details,
+            cache_key=stored_cache_key(score_details, cache_key),
+            status=MatchingStatus.COMPLETED,
+            evaluated_at=evaluation_time,
+        )
+        for cv_id, job_offer_id, score_value, score_details, cache_key in results
+    ]
+
+    return CVMatching.objects.bulk_create(
+        matchings,
+        update_conflicts=True,
+        unique_fields=['job_offer', 'cv'],
+        update_fields=['score', 'score_description', 'cache_key', 'status', 'evaluated_at'],
+    )
+
 
 class ScoringData(BaseModel):
-    experience: float = Field(default=0,
-                              description='Experience score based on the deterministic score but adjusted by you (0-100)')
-    skills: float = Field(default=0,
-                          description='Skills score based on the deterministic score but adjusted by you (0-100)')
-    education: float = Field(default=0,
-                             description='Education score based on the deterministic score but adjusted by you (0-100)')
-    languages: float = Field(default=0, description='Languages score given by you (0-100)')
-    job_fit: float = Field(default=0, description='Job fit score given by you (0-100)')
+    model_config = ConfigDict(frozen=True, extra='forbid')
+
+    experience: float = Field(..., ge=0, le=100,
+                              description='Experience score (0-100): the deterministic one, adjusted by you')
+    skills: float = Field(..., ge=0, le=100,
+                          description='Skills score (0-100): the deterministic one, adjusted by you')
+    education: float = Field(..., ge=0, le=100,
+                             description='Education score (0-100): the deterministic one, adjusted by you')
+    languages: float = Field(..., ge=0, le=100, description='Languages score (0-100) given by you')
+    job_fit: float = Field(..., ge=0, le=100, description='Job fit score (0-100) given by you')
 
     score_comments: List[str] = Field(...,
-                                      description='For each adjusted score, explain in 2 lines max why you adjusted it as you did.')
+                                      description='For each adjusted score, at most 2 short sentences on why you adjusted it.')
     strengths: List[str] = Field(..., description='Strengths (bonus XP, high qualifications, certificates, etc.)')
     weaknesses: List[str] = Field(..., description='Points to watch out for or weaknesses')
     missing_skills: List[str] = Field(..., description='Key skills lacking in relation to supply')
@@ -37,36 +115,91 @@ class ScoringData(BaseModel):
 
 
 class GlobalScorer:
+    WEIGHTS = WEIGHTS
+
+    SYSTEM_PROMPT = (
+        """
+### ROLE
+You are a Technical Recruitment Expert (Senior Talent Acquisition). Your role is to audit the raw scores generated by an algorithm and add human and semantic nuance to produce the final matching score.
+You receive the job criteria, the data extracted from the CV, the deterministic scores (based on strict matching) and the weights used for the final computation score.
+
+### ADJUSTMENT INSTRUCTIONS
+- **Experience**: 
+  - **CRITICAL**: Only count experience in the SAME DOMAIN as the job offer. Experience in unrelated fields (e.g., healthcare experience for a software engineering role, or finance experience for a marketing role) should NOT contribute to the experience score.
+  - Within the relevant domain: If the candidate has fewer years of experience than required but has worked for prestigious companies or on identical technologies, slightly increase the score. 
+  - If the candidate has more years of relevant experience than required, cap the score at 100 but mention it as a strength.
+  - **Example**: 8 years in healthcare = 0 relevant experience for a software engineering position. Only software engineering experience counts.
+  
+- **Skills**: Identify synonyms (e.g., 'React' vs. 'ReactJS') or related technologies that the deterministic algorithm may have missed and adjust the score accordingly.
+
+- **Degree**: Assess the relevance of the field of study to the position. A degree in an unrelated field should be scored lower even if the level matches.
+
+### ADDITIONAL CALCULATIONS
+- **Language Score (0-100):** Based on the requirements of the job offer (e.g., fluent English) and even the language of the CV.
+- **Job Fit (0-100):** Assesses whether past tasks match the job description. Only consider tasks and roles within the same domain as the job offer.
+
+### DOMAIN RELEVANCE VALIDATION
+Before scoring experience:
+1. Identify the primary domain/industry of the job offer (e.g., Software Engineering, Healthcare, Finance, Marketing, Sales, etc.)
+2. For each experience entry in the CV, determine if it belongs to the same domain
+3. Exclude or heavily penalize experience from unrelated domains
+4. Clearly state in your comments which experiences were considered relevant and which were excluded
+
+### CRITERIA FOR STRENGTHS:
+- Years of **RELEVANT** experience (in the same domain) > Required.
+- Degree > Required level or in a field relevant/prestigious for the position.
+- Relevant certifications **in the job domain**.
+- Strong fit between past assignments and future position **within the same domain**.
+- Any other relevant insights you found
+
+### FINAL TASK
+Analyze the data and provide the scores and review. 
+You must strictly follow the provided output schema for the final JSON response.
+Make sure to explain your adjustment in the `score_comments`, especially which experiences were counted as relevant and which were excluded.
+Make sure to explain your reasoning in the review section, particularly regarding domain alignment.
+            """
+    )
+
+    HUMAN_PROMPT = (
+        """
+### INPUT DATA
+1. JOB CRITERIA: {job_requirements}
+2. DATA EXTRACTED FROM THE CV: {candidate_data}
+3. DETERMINISTIC SCORES: {deterministic_scores} (Based on strict matching)
+
+### WEIGHTS
+That are the weights used for the final computation score:
+{weights}
+            """
+    )
+
+
     def __init__(self, offer: JobOffer, cv: CV):
+        """
+            The data already extracted from the CV is reused, the CV is only extracted when it never was
+        """
         self.extractor: Extractor = Extractor(cv)
         self.offer: JobOffer = offer
         self.deterministic_score: Dict[str, float] = {}
 
         try:
-            self.extractor.semantic_extract()
+            if not cv.is_extracted:
+                self.extractor.semantic_extract()
+            self.extractor.load_from_model()
         except Exception as e:
-            logger.error(format_exc(e))
+            log_exception(logger, f'Unable to load CV {cv.pk}', e)
             raise e
 
-        if settings.EXTRACTION_MODEL_PROVIDER == 'openai':
-            self.llm = ChatOpenAI(model=settings.EXTRACTION_MODEL, temperature=0)
-        elif settings.EXTRACTION_MODEL_PROVIDER == 'anthropic':
-            self.llm = ChatAnthropic(model=settings.EXTRACTION_MODEL, temperature=0)
-        elif settings.EXTRACTION_MODEL_PROVIDER == 'ollama':
-            self.llm = ChatOllama(model=settings.EXTRACTION_MODEL, temperature=0)
-        else:
-            self.llm = None
-
-        self.weights = {
-            'experience': 0.25,
-            'skills': 0.35,
-            'education': 0.10,
-            'languages': 0.10,
-            'job_fit': 0.20,
-        }
+        self.llm = get_llm()
+
+        self.weights = self.WEIGHTS
 
         logger.info(f'Loaded global extractor with weights: {self.weights}')
 
+    @property
+    def cache_key(self) -> str:
+        return matching_cache_key(self.extractor.extraction_hash, self.offer.current_signature_hash)
+
     def _score_experience(self) -> float:
         """
             Score the candidate experience comparing to the offer required experience
@@ -89,18 +222,19 @@ class GlobalScorer:
             Score the candidate skills comparing to the offer required skills
 
             Rule:
-            Naïve approach by list intersection, considering that all skills are equal
+            Naïve approach by list intersection of the canonical skill names (see `matching.skills`), considering that
+            all skills are equal
         """
         if not self.offer.required_skills:
             return 100.0
 
-        candidate_skills = {skill.lower() for skill in self.extractor.skills}
-        required_skills = {skill.strip().lower() for skill in self.offer.required_skills.split(',')}
+        candidate_skills = self.extractor.skills_normalized_set
+        required_skills = self.offer.required_skills_normalized_set
 
         logger.info(f'Candidate skills: {candidate_skills}')
         logger.info(f'Required skills: {required_skills}')
 
-        matches = required_skills.intersection(candidate_skills)
+        matches = required_skills & candidate_skills
 
         return 0 if not candidate_skills else (len(matches) / len(candidate_skills)) * 100.0
 
@@ -131,86 +265,301 @@ class GlobalScorer:
         }
         logger.info(f'Computed deterministic score: {self.deterministic_score}')
 
-    def compute_score(self) -> Tuple[float, Dict]:
+    def prefilter(self) -> Optional[Tuple[float, Dict]]:
         """
-            Compute final score on the candidate by using the deterministic and the LLM power
+            Deterministic result of a CV too far from the offer to be worth an LLM call, None if it should be scored
+
+            The preliminary score weights the deterministic scores like the LLM ones (so it is at most 70) and is
+            compared to `LLM_MIN_PREFILTER_SCORE`, 0 disabling the pre-filter.
         """
+        if not self.deterministic_score:
+            self.compute_deterministic_score()
 
-        self.compute_deterministic_score()
+        preliminary_score = (self.weights['experience'] * self.deterministic_score['experience_score']
+                             + self.weights['skills'] * self.deterministic_score['skill_score']
+                             + self.weights['education'] * self.deterministic_score['diploma_score'])
 
-        if not self.llm:
-            # Considering that there is no llm has been charged
-            return 0.0, {}
+        if preliminary_score >= settings.LLM_MIN_PREFILTER_SCORE:
+            return None
 
-        structured_llm = self.llm.with_structured_output(ScoringData)
+        logger.info(f'Preliminary score {preliminary_score} below {settings.LLM_MIN_PREFILTER_SCORE}, skipping the LLM')
 
-        prompt = (
-            """
-          ### ROLE
-You are a Technical Recruitment Expert (Senior Talent Acquisition). Your role is to audit the raw scores generated by an algorithm and add human and semantic nuance to produce the final matching score.
+        return preliminary_score, {
+            'prefiltered': True,
+            'reason': 'below_threshold',
+            'deterministic_scores': self.deterministic_score,
+        }
 
-### INPUT DATA
-1. JOB CRITERIA: {job_requirements}
-2. DATA EXTRACTED FROM THE CV: {candidate_data}
-3. DETERMINISTIC SCORES: {deterministic_scores} (Based on strict matching)
+    @classmethod
+    def _scoring_prompt(cls, human_prompt: str = HUMAN_PROMPT) -> ChatPromptTemplate:
+        return cls._build_scoring_prompt(settings.EXTRACTION_MODEL_PROVIDER, human_prompt)
 
-### ADJUSTMENT INSTRUCTIONS
-- **Experience**: 
-  - **CRITICAL**: Only count experience in the SAME DOMAIN as the job offer. Experience in unrelated fields (e.g., healthcare experience for a software engineering role, or finance experience for a marketing role) should NOT contribute to the experience score.
-  - Within the relevant domain: If the candidate has fewer years of experience than required but has worked for prestigious companies or on identical technologies, slightly increase the score. 
-  - If the candidate has more years of relevant experience than required, cap the score at 100 but mention it as a strength.
-  - **Example**: 8 years in healthcare = 0 relevant experience for a software engineering position. Only software engineering experience counts.
-  
-- **Skills**: Identify synonyms (e.g., 'React' vs. 'ReactJS') or related technologies that the deterministic algorithm may have missed and adjust the score accordingly.
+    @classmethod
+    @lru_cache(maxsize=None)
+    def _build_scoring_prompt(cls, provider: str, human_prompt: str) -> ChatPromptTemplate:
+        """
+            Scoring prompt with the static instructions first, as a system message, and the variable data last
 
-- **Degree**: Assess the relevance of the field of study to the position. A degree in an unrelated field should be scored lower even if the level matches.
+            OpenAI caches such a repeated prefix automatically, Anthropic needs an explicit cache breakpoint on it.
+            The template is parsed once per provider and human prompt.
+        """
+        if provider == 'anthropic':
+            system_message = SystemMessage(content=[
+                {'type': 'text', 'text': cls.SYSTEM_PROMPT, 'cache_control': {'type': 'ephemeral'}},
+            ])
+        else:
+            system_message = SystemMessage(content=cls.SYSTEM_PROMPT)
 
-### ADDITIONAL CALCULATIONS
-- **Language Score (0-100):** Based on the requirements of the job offer (e.g., fluent English) and even the language of the CV.
-- **Job Fit (0-100):** Assesses whether past tasks match the job description. Only consider tasks and roles within the same domain as the job offer.
+        return ChatPromptTemplate.from_messages([system_message, ('human', human_prompt)])
 
-### DOMAIN RELEVANCE VALIDATION
-Before scoring experience:
-1. Identify the primary domain/industry of the job offer (e.g., Software Engineering, Healthcare, Finance, Marketing, Sales, etc.)
-2. For each experience entry in the CV, determine if it belongs to the same domain
-3. Exclude or heavily penalize experience from unrelated domains
-4. Clearly state in your comments which experiences were considered relevant and which were excluded
+    @classmethod
+    def _scoring_chain(cls) -> Optional[Runnable]:
+        return cls._build_scoring_chain(settings.EXTRACTION_MODEL_PROVIDER, settings.EXTRACTION_MODEL)
 
-### CRITERIA FOR STRENGTHS:
-- Years of **RELEVANT** experience (in the same domain) > Required.
-- Degree > Required level or in a field relevant/prestigious for the position.
-- Relevant certifications **in the job domain**.
-- Strong fit between past assignments and future position **within the same domain**.
-- Any other relevant insights you found
+    @classmethod
+    @lru_cache(maxsize=None)
+    def _build_scoring_chain(cls, provider: str, model: str) -> Optional[Runnable]:
+        """
+            Scoring prompt piped into the structured model, built once per (provider, model)
 
-### WEIGHTS
-That are the weights used for the final computation score:
-{weights}
+            The chain returns the raw output dict, to unwrap with `_parse_scoring_output`.
+        """
+        structured_llm = get_structured_llm(ScoringData, include_raw=True)
+        if not structured_llm:
+            return None
 
-### FINAL TASK
-Analyze the data and provide the scores and review. 
-You must strictly follow the provided output schema for the final JSON response.
-Make sure to explain your adjustment in the `score_comments`, especially which experiences were counted as relevant and which were excluded.
-Make sure to explain your reasoning in the review section, particularly regarding domain alignment.
-            """
-        )
+        return cls._scoring_prompt() | structured_llm
+
+    @staticmethod
+    def _parse_scoring_output(output: Dict) -> ScoringData:
+        """
+            Unwrap a structured output produced with `include_raw=True`, logging the prompt cache usage
+        """
+        if output['parsing_error']:
+            raise output['parsing_error']
+
+        usage = output['raw'].usage_metadata or {}
+        token_details = usage.get('input_token_details', {})
+        logger.info(f'Prompt cache usage: {token_details.get("cache_read", 0)} tokens read, '
+                    f'{token_details.get("cache_creation", 0)} tokens written, '
+                    f'{usage.get("input_tokens", 0)} input tokens')
+
+        return output['parsed']
+
+    def _prompt_inputs(self) -> Dict[str, str]:
+        """
+            Build the scoring prompt variables for this offer/CV pair
+        """
+        self.compute_deterministic_score()
+
+        # Sorted JSON keeps the prompt byte-identical for identical inputs, so the LLM cache can hit
+        return {
+            'job_requirements': json.dumps(self.offer.scoring_dict(), sort_keys=True, default=str),
+            'candidate_data': json.dumps(self.extractor.cv.scoring_dict(), sort_keys=True, default=str),
+            'deterministic_scores': self.deterministic_score,
+            'weights': self.weights,
+        }
+
+    @classmethod
+    def _score_vector(cls, results: Dict) -> np.ndarray:
+        # Every score is required by `ScoringData`, a missing one is a bug and raises a KeyError
+        return np.fromiter((results[field] for field in SCORE_FIELDS), dtype=np.float64, count=len(SCORE_FIELDS))
+
+    @classmethod
+    def weighted_score(cls, results: Dict) -> float:
+        """
+            Global score out of 100 from the LLM scores of a `ScoringData` dict
+        """
+        return float(WEIGHT_VEC @ cls._score_vector(results))
+
+    @classmethod
+    def _global_scores(cls, results: List[Dict]) -> np.ndarray:
+        """
+            Global scores of many results at once, as a single (N, 5) @ (5,) product
+        """
+        if not results:
+            return np.zeros(0)
+
+        return np.stack([cls._score_vector(result) for result in results]) @ WEIGHT_VEC
+
+    def scoring_messages(self) -> List[BaseMessage]:
+        """
+            Chat messages sent to the LLM to score this offer/CV pair
+        """
+        return self._scoring_prompt().format_messages(**self._prompt_inputs())
+
+    def compute_score(self) -> Tuple[float, Dict]:
+        """
+            Compute final score on the candidate by using the deterministic and the LLM power
+        """
+
+        prompt_inputs = self._prompt_inputs()
 
-        job_requirements = self.offer.to_dict()
-        candidate_data = self.extractor.to_dict()
+        prefiltered = self.prefilter()
+        if prefiltered:
+            return prefiltered
+
+        scoring_chain = self._scoring_chain()
+        if not scoring_chain:
+            # Considering that there is no llm has been charged
+            return 0.0, {}
 
         logger.info('Computing the final score...')
-        result = structured_llm.invoke(prompt.format(
-            job_requirements=job_requirements,
-            candidate_data=candidate_data,
-            deterministic_scores=self.deterministic_score,
-            weights=self.weights,
-        ))
-        results = result.dict()
-        global_score = self.weights['experience'] * results.get('experience') + self.weights['skills'] * results.get(
-            'skills') + self.weights['education'] * results.get('education') + self.weights['languages'] * results.get(
-            'languages') + self.weights['job_fit'] * results['job_fit']
+        result = self._parse_scoring_output(scoring_chain.invoke(prompt_inputs))
+        results = result.model_dump()
+        global_score = self.weighted_score(results)
 
         logger.info(f'Computation completed with the result: {global_score}/100')
         logger.info(f'See details below:\n {results}')
 
         return global_score, results
+
+    async def _ascore_details(self, semaphore: Optional[asyncio.Semaphore] = None) -> Dict:
+        """
+            Ask the LLM for the adjusted scores and review, waiting for a `semaphore` slot if given
+        """
+        prompt_inputs = self._prompt_inputs()
+
+        scoring_chain = self._scoring_chain()
+        if not scoring_chain:
+            # Considering that there is no llm has been charged
+            return {}
+
+        async with semaphore or nullcontext():
+            output = await scoring_chain.ainvoke(prompt_inputs)
+
+        return self._parse_scoring_output(output).model_dump()
+
+    def save_matching(self, score_value: float, score_details: Dict) -> CVMatching:
+        """
+            Save the computed score as the completed matching of this offer/CV pair
+        """
+        matching, _ = CVMatching.objects.update_or_create(
+            job_offer=self.offer,
+            cv=self.extractor.cv,
+            defaults={
+                'score': score_value,
+                'score_description': score_details,
+                'cache_key': stored_cache_key(score_details, self.cache_key),
+                'status': MatchingStatus.COMPLETED,
+                'evaluated_at': timezone.now(),
+            }
+        )
+
+        return matching
+
+    def _stream_start(self) -> Tuple[List[Dict], Optional[Tuple[Runnable, Dict]]]:
+        """
+            Events sent before the LLM review, and the streaming chain with its inputs (None when the LLM is skipped)
+        """
+        prompt_inputs = self._prompt_inputs()
+        events = [{'deterministic_scores': self.deterministic_score}]
+
+        prefiltered = self.prefilter()
+        if prefiltered:
+            events.append({'score': prefiltered[0], 'score_details': prefiltered[1]})
+            return events, None
+
+        if not self.llm:
+            # Considering that there is no llm has been charged
+            events.append({'score': 0.0, 'score_details': {}})
+            return events, None
+
+        # Partial JSON is parsed from the raw token stream, which works the same way for every provider
+        parser = JsonOutputParser(pydantic_object=ScoringData)
+        chain = self._scoring_prompt(self.HUMAN_PROMPT + '\n{format_instructions}') | self.llm | parser
+
+        logger.info('Streaming the final score...')
+        return events, (chain, {**prompt_inputs, 'format_instructions': parser.get_format_instructions()})
+
+    def _stream_end(self, partial: Dict) -> Dict:
+        results = ScoringData(**partial).model_dump()
+        global_score = self.weighted_score(results)
+
+        logger.info(f'Streamed computation completed with the result: {global_score}/100')
+
+        return {'score': global_score, 'score_details': results}
+
+    def stream_score(self) -> Iterator[Dict]:
+        """
+            Stream the score computation as events
+
+            The deterministic scores are yielded first, followed by the partial LLM review as its JSON is generated,
+            and finally the global score with the complete details.
+        """
+        events, stream = self._stream_start()
+        yield from events
+        if not stream:
+            return
+
+        chain, inputs = stream
+        partial = {}
+        for partial in chain.stream(inputs):
+            yield {'score_details': partial}
+
+        yield self._stream_end(partial)
+
+    async def astream_score(self) -> AsyncIterator[Dict]:
+        """
+            Async version of `stream_score`
+        """
+        events, stream = self._stream_start()
+        for event in events:
+            yield event
+        if not stream:
+            return
+
+        chain, inputs = stream
+        partial = {}
+        async with async_http_pool():
+            async for partial in chain.astream(inputs):
+                yield {'score_details': partial}
+
+        yield self._stream_end(partial)
+
+    @classmethod
+    def score_many(cls, offer: JobOffer, cvs: List[CV]) -> List[Tuple[float, Dict]]:
+        """
+            Score many CVs against the same offer, running the LLM calls concurrently (`asyncio.gather`)
+
+            CVs below the pre-filter threshold (see `prefilter`) get their deterministic result without any LLM call.
+            Results are returned in the same order as `cvs`.
+        """
+
+        def extract(cv: CV):
+            try:
+                Extractor(cv).semantic_extract()
+            finally:
+                # Worker threads get their own DB connection, release it before the thread is reused
+                connections.close_all()
+
+        # Semantic extraction is I/O bound (file parsing + LLM call), so run it in threads
+        with ThreadPoolExecutor(max_workers=settings.SCORER_CONCURRENCY) as executor:
+            list(executor.map(extract, cvs))
+
+        scorers = [cls(offer=offer, cv=cv) for cv in cvs]
+        if not scorers:
+            return []
+
+        scores: List[Optional[Tuple[float, Dict]]] = [scorer.prefilter() for scorer in scorers]
+        pending = [index for index, score in enumerate(scores) if score is None]
+
+        async def score_all() -> List[Dict]:
+            # At most LLM_MAX_CONCURRENCY calls are in flight, the others wait for a slot
+            semaphore = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+            # The loop of async_to_sync is closed right after, so are the connections opened on it
+            async with async_http_pool():
+                return await asyncio.gather(*(scorers[index]._ascore_details(semaphore) for index in pending))
+
+        if pending:
+            logger.info(f'Computing the final score of {len(pending)}/{len(scorers)} CVs for offer {offer.pk}...')
+            results = async_to_sync(score_all)()
+
+            # Without llm the details are empty and the score is 0
+            global_scores = iter(cls._global_scores([result for result in results if result]))
+            for index, result in zip(pending, results):
+                scores[index] = (float(next(global_scores)) if result else 0.0, result)
+
+        logger.info(f'Batch computation completed with the results: {[score for score, _ in scores]}')
+
+        return scores
@@ -1,17 +1,19 @@
-import json
 import logging
+import uuid
+from typing import Dict, List, Optional, Tuple
 
-from django.utils import timezone
-
-from rest_framework.response import Response
-from rest_framework import serializers, status
-
-from traceback_with_variables import format_exc
+from rest_framework import serializers
 
+from common_bases.logs import log_exception
+from matching.enums import MatchingStatus
 from matching.models import CV
 from matching.models import CVMatching
 from matching.models import JobOffer
+from matching.prefilter import rank_candidates
 from matching.scorer import GlobalScorer
+from matching.scorer import matching_cache_key
+from matching.scorer import persist_matchings
+from matching.tasks import score_cv_task
 
 logger = logging.getLogger(__name__)
 
@@ -82,9 +84,37 @@ class CVSerializer(serializers.ModelSerializer):
         )
 
 
-class CVMatchingSerializer(serializers.ModelSerializer):
-    job_offer = JobOfferSerializer(read_only=True)
-    cv = CVSerializer(read_only=True)
+class JobOfferListSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = JobOffer
+        fields = [
+            'id',
+            'title',
+            'company_name',
+            'location',
+            'contract_type',
+            'work_type',
+        ]
+
+
+class CVListSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CV
+        fields = [
+            'id',
+            'name',
+            'title',
+            'diploma',
+            'year_experience',
+        ]
+
+
+class CVMatchingListSerializer(serializers.ModelSerializer):
+    """
+        Light matching representation for the list endpoints, without the large CV and job offer fields
+    """
+    job_offer = JobOfferListSerializer(read_only=True)
+    cv = CVListSerializer(read_only=True)
     score_details = serializers.SerializerMethodField()
 
     class Meta:
@@ -94,20 +124,37 @@ class CVMatchingSerializer(serializers.ModelSerializer):
             'job_offer',
             'cv',
             'score',
+            'status',
             'score_details',
-            'score_description',
             'evaluated_at',
         )
         read_only_fields = fields
 
     def get_score_details(self, obj: CVMatching):
-        if not obj.score_description:
-            return {}
+        return obj.score_description or {}
 
-        try:
-            return json.loads(obj.score_description)
-        except (TypeError, json.JSONDecodeError):
-            return {'raw': obj.score_description}
+
+class CVMatchingScoreSerializer(serializers.ModelSerializer):
+    """
+        Minimal scoring result, fetch the CV or the job offer for their details
+    """
+    matching_id = serializers.IntegerField(source='id', read_only=True)
+    job_offer_id = serializers.IntegerField(read_only=True)
+    cv_id = serializers.IntegerField(read_only=True)
+    score_details = serializers.JSONField(source='score_description', read_only=True)
+
+    class Meta:
+        model = CVMatching
+        fields = (
+            'matching_id',
+            'job_offer_id',
+            'cv_id',
+            'status',
+            'score',
+            'score_details',
+            'evaluated_at',
+        )
+        read_only_fields = fields
 
 
 class CVScoreSerializer(serializers.Serializer):
@@ -125,39 +172,93 @@ class CVScoreSerializer(serializers.Serializer):
 
         return attrs
 
-    def save(self, **kwargs):
+    def save(self, **kwargs) -> Tuple[Dict, bool]:
+        """
+            Enqueue the scoring, unless the CV was already scored against the same version of the offer
+
+            In that case the stored matching is returned, otherwise the matching is created (or reset) as pending
+            until the task fills it. Returns the response data and whether a scoring task was enqueued.
+        """
         job_offer: JobOffer = self.validated_data['job_offer']
         cv: CV = self.context['cv']
 
-        try:
-            scorer = GlobalScorer(offer=job_offer, cv=cv)
-            score_value, score_details = scorer.compute_score()
-        except Exception as e:
-            logger.error(format_exc(e))
-            raise Response({'error': f'Unable to compute score due to: {e}'}, status=status.HTTP_400_BAD_REQUEST) from e
-
-        try:
-            serialized_details = json.dumps(score_details)
-        except (TypeError, ValueError) as e:
-            logger.error(format_exc(e))
-            return Response({'error': 'Unable to serialize score details.'}, status=status.HTTP_400_BAD_REQUEST)
+        if cv.is_extracted:
+            matching = (CVMatching.objects
+                        .filter(cv=cv, job_offer=job_offer, status=MatchingStatus.COMPLETED,
+                                cache_key=matching_cache_key(cv.extraction_hash, job_offer.current_signature_hash))
+                        .first())
+            if matching:
+                logger.info(f'CV {cv.id} already scored against job offer {job_offer.id}, reusing matching {matching.id}')
+                return CVMatchingScoreSerializer(matching).data, False
 
-        evaluation_time = timezone.now()
+        # The task id is known upfront so the matching can reference it before the task starts; the cache key is
+        # cleared so a pending or failed matching is never taken for a stored score
+        task_id = str(uuid.uuid4())
         matching, _ = CVMatching.objects.update_or_create(
             job_offer=job_offer,
             cv=cv,
-            defaults={
-                'score': score_value,
-                'score_description': serialized_details,
-                'evaluated_at': evaluation_time,
-            }
+            defaults={'status': MatchingStatus.PENDING, 'task_id': task_id, 'cache_key': ''},
         )
+        score_cv_task.apply_async(args=(cv.id, job_offer.id), task_id=task_id)
 
         return {
             'matching_id': matching.id,
-            'score': matching.score,
-            'score_details': score_details,
-            'evaluated_at': matching.evaluated_at,
-            'job_offer': JobOfferSerializer(job_offer).data,
-            'cv': CVSerializer(cv).data,
-        }
+            'status': matching.status,
+        }, True
+
+
+class BulkCVScoreSerializer(serializers.Serializer):
+    cv_ids = serializers.PrimaryKeyRelatedField(
+        source='cvs',
+        queryset=CV.objects.all(),
+        many=True,
+        required=False,
+        allow_empty=False,
+        help_text='Identifiers of the CVs that should be matched against the job offer '
+                  '(all the uploaded CVs when omitted, top_k is then required)',
+    )
+    top_k = serializers.IntegerField(
+        required=False,
+        min_value=1,
+        help_text='Only score the top_k CVs the most similar to the job offer (cheap pre-filter before the LLM)',
+    )
+
+    def validate(self, attrs):
+        if 'cvs' not in attrs:
+            # Scoring every uploaded CV would not fit in a synchronous request, they can only be shortlisted
+            if not attrs.get('top_k'):
+                raise serializers.ValidationError({'top_k': ['top_k is required when cv_ids is omitted.']})
+            attrs['cvs'] = list(CV.objects.exclude(file='').order_by('id'))
+            return attrs
+
+        # Scoring a CV twice would also make the bulk upsert touch the same matching twice
+        attrs['cvs'] = list(dict.fromkeys(attrs['cvs']))
+        missing_files = [cv.id for cv in attrs['cvs'] if not cv.file]
+
+        if missing_files:
+            raise serializers.ValidationError(
+                {'cv_ids': [f'CV file not found for CVs {missing_files}. Upload a file before scoring.']})
+
+        return attrs
+
+    def save(self, **kwargs):
+        job_offer: JobOffer = self.context['job_offer']
+        cvs: List[CV] = self.validated_data['cvs']
+        top_k: Optional[int] = self.validated_data.get('top_k')
+
+        if top_k:
+            cvs = rank_candidates(offer=job_offer, cvs=cvs, top_k=top_k)
+
+        try:
+            scores = GlobalScorer.score_many(offer=job_offer, cvs=cvs)
+        except Exception as e:
+            log_exception(logger, f'Unable to score CVs for job offer {job_offer.id}', e)
+            raise serializers.ValidationError({'error': f'Unable to compute scores due to: {e}'}) from e
+
+        matchings = persist_matchings([
+            (cv.id, job_offer.id, score_value, score_details,
+             matching_cache_key(cv.extraction_hash, job_offer.current_signature_hash))
+            for cv, (score_value, score_details) in zip(cvs, scores)
+        ])
+
+        return CVMatchingScoreSerializer(matchings, many=True).data
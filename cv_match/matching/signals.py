@@ -0,0 +1,29 @@
+import hashlib
+import logging
+
+from django.db.models.signals import pre_save
+from django.dispatch import receiver
+
+from matching.models import CV
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(pre_save, sender=CV)
+def reset_extraction_on_file_change(sender, instance: CV, **kwargs):
+    """
+        Clear the extracted data of a CV whose file is replaced by a different one
+
+        Uploading the same file again keeps the extracted data, so it is not sent to the LLM twice.
+    """
+    # A file loaded from the database is committed, only a newly assigned one is not
+    if instance._state.adding or instance.file._committed or not instance.extraction_hash:
+        return
+
+    file_hash = hashlib.sha256()
+    for chunk in instance.file.chunks():
+        file_hash.update(chunk)
+
+    if file_hash.hexdigest() != instance.extraction_hash:
+        logger.info(f'File of CV {instance.pk} changed, clearing its extracted data')
+        instance.reset_extraction()
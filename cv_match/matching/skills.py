@@ -0,0 +1,33 @@
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+import yaml
+
+SYNONYMS_PATH = Path(__file__).resolve().parent / 'skill_synonyms.yaml'
+
+
+def _load_synonyms() -> Dict[str, str]:
+    with open(SYNONYMS_PATH) as synonyms_file:
+        canonical_names = yaml.safe_load(synonyms_file) or {}
+
+    return {
+        alias: canonical
+        for canonical, aliases in canonical_names.items()
+        for alias in aliases
+    }
+
+
+# Spelling of a skill -> its canonical name, e.g. 'reactjs' -> 'react'
+SYNONYMS: Dict[str, str] = _load_synonyms()
+
+
+def normalize_skill(skill: str) -> str:
+    skill = skill.strip().lower()
+    return SYNONYMS.get(skill, skill)
+
+
+def normalize_skills(skills: Iterable[str]) -> List[str]:
+    """
+        Canonical names of the given skills, without blanks and duplicates, in their original order
+    """
+    return list(dict.fromkeys(normalize_skill(skill) for skill in skills if skill.strip()))
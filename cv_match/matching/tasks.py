@@ -0,0 +1,39 @@
+import logging
+
+from celery import shared_task
+
+from matching.batch_scorer import poll_batches as poll_scoring_batches
+from matching.enums import MatchingStatus
+from matching.models import CVMatching
+from matching.scorer import GlobalScorer
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True, acks_late=True)
+def score_cv_task(self, cv_id: int, job_offer_id: int) -> int:
+    """
+        Score a CV against a job offer, extracting the CV first if needed, and fill its pending matching
+
+        The task is acknowledged once done, so a scoring interrupted by a worker crash is run again.
+        Returns the matching id.
+    """
+    matching = CVMatching.objects.select_related('cv', 'job_offer').get(cv_id=cv_id, job_offer_id=job_offer_id)
+
+    try:
+        scorer = GlobalScorer(offer=matching.job_offer, cv=matching.cv)
+        score_value, score_details = scorer.compute_score()
+    except Exception:
+        matching.status = MatchingStatus.FAILED
+        matching.save(update_fields=['status'])
+        raise
+
+    return scorer.save_matching(score_value, score_details).id
+
+
+@shared_task
+def poll_batches():
+    """
+        Periodically save the results of the completed scoring batches (see CELERY_BEAT_SCHEDULE)
+    """
+    poll_scoring_batches()
@@ -1,3 +1,13 @@
-from django.test import TestCase
+from importlib import import_module
 
-# Create your tests here.
+from django.conf import settings
+from django.test import SimpleTestCase
+
+
+class ImportTestCase(SimpleTestCase):
+
+    def test_urlconf_imports(self):
+        """
+            Every view, serializer and task module is loaded by the URLconf, a broken import fails every API route
+        """
+        import_module(settings.ROOT_URLCONF)
@@ -1,25 +1,48 @@
+import json
 import logging
 
+from asgiref.sync import sync_to_async
+
+from celery.exceptions import TimeoutError as CeleryTimeoutError
+from celery.result import AsyncResult
+
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+
 from rest_framework import status, viewsets
 from rest_framework.parsers import FormParser, MultiPartParser, JSONParser
+from rest_framework.renderers import JSONRenderer
 from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 
 from drf_spectacular.utils import OpenApiParameter, OpenApiTypes, extend_schema
 
-from traceback_with_variables import format_exc
-
+from common_bases.logs import log_exception
+from common_bases.pagination import CVMatchingCursorPagination
+from matching.enums import MatchingStatus
 from matching.filters import MatchingScoreFilter
 from matching.models import CV
 from matching.models import JobOffer
-from matching.serializers import CVMatchingSerializer
+from matching.renderers import EventStreamRenderer
+from matching.scorer import GlobalScorer
+from matching.serializers import BulkCVScoreSerializer
+from matching.serializers import CVMatchingListSerializer
+from matching.serializers import CVMatchingScoreSerializer
 from matching.serializers import CVScoreSerializer
 from matching.serializers import CVSerializer
 from matching.serializers import JobOfferSerializer
 
 logger = logging.getLogger(__name__)
 
+# Seconds score_status?wait=true blocks for a pending scoring
+SCORE_STATUS_WAIT_TIMEOUT = 30
+
+# Large columns the list endpoints never render
+MATCHING_LIST_DEFERRED_FIELDS = ('cv__raw_text', 'cv__experiences', 'cv__description', 'job_offer__description')
+
 
 class LoggingModelViewSet(viewsets.ModelViewSet):
     """
@@ -27,7 +50,7 @@ class LoggingModelViewSet(viewsets.ModelViewSet):
     """
 
     def handle_exception(self, exc):
-        logger.error(format_exc(exc))
+        log_exception(logger, f'{exc.__class__.__name__} on {self.request.method} {self.request.path}', exc)
         return super().handle_exception(exc)
 
 
@@ -46,12 +69,15 @@ class JobOfferViewSet(LoggingModelViewSet):
                 description='Minimum score (0-100) a CV must have to be returned.',
             )
         ],
-        responses=CVMatchingSerializer(many=True),
+        responses=CVMatchingListSerializer(many=True),
     )
-    @action(detail=True, methods=['get'], url_path='matched_cvs')
+    @action(detail=True, methods=['get'], url_path='matched_cvs', pagination_class=CVMatchingCursorPagination)
     def matched_cvs(self, request, pk=None):
         job_offer = self.get_object()
-        base_queryset = job_offer.matchings.select_related('cv').order_by('-score')
+        base_queryset = (job_offer.matchings
+                         .filter(score__isnull=False)
+                         .select_related('cv', 'job_offer')
+                         .defer(*MATCHING_LIST_DEFERRED_FIELDS))
         filterset = MatchingScoreFilter(data=request.query_params, queryset=base_queryset)
 
         if not filterset.is_valid():
@@ -60,13 +86,22 @@ class JobOfferViewSet(LoggingModelViewSet):
         queryset = filterset.qs
 
         page = self.paginate_queryset(queryset)
-        serializer = CVMatchingSerializer(page or queryset, many=True)
+        serializer = CVMatchingListSerializer(page if page is not None else queryset, many=True)
 
         if page is not None:
             return self.get_paginated_response(serializer.data)
 
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+    @action(detail=True, methods=['post'], serializer_class=BulkCVScoreSerializer, url_path='score_all_cvs')
+    def score_all_cvs(self, request, pk=None):
+        job_offer = self.get_object()
+        serializer = BulkCVScoreSerializer(data=request.data, context={'job_offer': job_offer})
+        serializer.is_valid(raise_exception=True)
+
+        results = serializer.save()
+        return Response(results, status=status.HTTP_200_OK)
+
 
 class CVViewSet(LoggingModelViewSet):
     queryset = CV.objects.all().order_by('-uploaded_at')
@@ -80,8 +115,127 @@ class CVViewSet(LoggingModelViewSet):
         serializer = CVScoreSerializer(data=request.data, context={'cv': cv})
         serializer.is_valid(raise_exception=True)
 
-        result = serializer.save()
-        return Response(result, status=status.HTTP_200_OK)
+        result, enqueued = serializer.save()
+        if not enqueued:
+            # Nothing changed since the last scoring, the stored matching is returned right away
+            return Response(result, status=status.HTTP_200_OK)
+
+        result['status_url'] = request.build_absolute_uri(
+            reverse('cvs-score-status', kwargs={'pk': cv.pk}) + f'?matching_id={result["matching_id"]}')
+        return Response(result, status=status.HTTP_202_ACCEPTED)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name='job_offer_id',
+                location=OpenApiParameter.QUERY,
+                required=True,
+                type=OpenApiTypes.INT,
+                description='Identifier of the job offer the CV should be matched against.',
+            )
+        ],
+        responses={(200, 'text/event-stream'): OpenApiTypes.STR},
+    )
+    @action(detail=True, methods=['get'], url_path='score_job_offer_stream',
+            renderer_classes=[EventStreamRenderer, JSONRenderer])
+    def score_job_offer_stream(self, request, pk=None):
+        """
+            Stream the score of an extracted CV as Server-Sent Events, the deterministic scores come first
+
+            The final result is saved as the matching of the CV and the job offer, and its `matching_id` is sent.
+        """
+        cv = self.get_object()
+        serializer = CVScoreSerializer(data=request.query_params, context={'cv': cv})
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            scorer = GlobalScorer(offer=serializer.validated_data['job_offer'], cv=cv)
+        except ValueError as e:
+            raise ValidationError({'cv': [str(e)]}) from e
+
+        def stream_error(e: Exception) -> str:
+            log_exception(logger, f'Unable to stream the score of CV {cv.pk}', e)
+            return f'data: {json.dumps({"error": f"Unable to compute score due to: {e}"})}\n\n'
+
+        async def async_event_stream():
+            try:
+                async for event in scorer.astream_score():
+                    if 'score' in event:
+                        # The final event carries the complete result, save it before sending it
+                        matching = await sync_to_async(scorer.save_matching)(event['score'], event['score_details'])
+                        event = {**event, 'matching_id': matching.id}
+                    yield f'data: {json.dumps(event)}\n\n'
+            except Exception as e:
+                yield stream_error(e)
+
+        def event_stream():
+            try:
+                for event in scorer.stream_score():
+                    if 'score' in event:
+                        matching = scorer.save_matching(event['score'], event['score_details'])
+                        event = {**event, 'matching_id': matching.id}
+                    yield f'data: {json.dumps(event)}\n\n'
+            except Exception as e:
+                yield stream_error(e)
+
+        # WSGI handlers consume an async iterator entirely before sending anything, so they get the sync stream
+        is_asgi = isinstance(request._request, ASGIRequest)
+        response = StreamingHttpResponse(async_event_stream() if is_asgi else event_stream(),
+                                         content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+
+        return response
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name='matching_id',
+                location=OpenApiParameter.QUERY,
+                required=True,
+                type=OpenApiTypes.INT,
+                description='Identifier returned by the score_job_offer endpoint.',
+            ),
+            OpenApiParameter(
+                name='wait',
+                location=OpenApiParameter.QUERY,
+                required=False,
+                type=OpenApiTypes.BOOL,
+                description=f'Wait up to {SCORE_STATUS_WAIT_TIMEOUT}s for a pending scoring to complete.',
+            ),
+        ],
+        responses=CVMatchingScoreSerializer,
+    )
+    @action(detail=True, methods=['get'], url_path='score_status')
+    def score_status(self, request, pk=None):
+        cv = self.get_object()
+        matching_id = request.query_params.get('matching_id')
+
+        if not matching_id:
+            raise ValidationError({'matching_id': ['This query parameter is required.']})
+
+        matching = get_object_or_404(cv.matchings, pk=matching_id)
+
+        if (matching.status == MatchingStatus.PENDING and matching.task_id
+                and request.query_params.get('wait') == 'true'):
+            try:
+                AsyncResult(matching.task_id).get(timeout=SCORE_STATUS_WAIT_TIMEOUT, propagate=False)
+            except CeleryTimeoutError:
+                pass
+            matching.refresh_from_db()
+
+        if matching.status == MatchingStatus.FAILED:
+            return Response({'matching_id': matching.id, 'status': matching.status,
+                             'error': f'Unable to compute score due to: {AsyncResult(matching.task_id).result}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        if matching.status == MatchingStatus.PENDING:
+            return Response({'matching_id': matching.id, 'status': matching.status},
+                            status=status.HTTP_202_ACCEPTED)
+
+        serializer = CVMatchingScoreSerializer(matching)
+
+        return Response(serializer.data, status=status.HTTP_200_OK)
 
     @extend_schema(
         parameters=[
@@ -93,12 +247,16 @@ class CVViewSet(LoggingModelViewSet):
                 description='Minimum score (0-100) a job offer must have to be returned.',
             )
         ],
-        responses=CVMatchingSerializer(many=True),
+        responses=CVMatchingListSerializer(many=True),
     )
-    @action(detail=True, methods=['get'], url_path='matched-job-offers')
+    @action(detail=True, methods=['get'], url_path='matched-job-offers',
+            pagination_class=CVMatchingCursorPagination)
     def matched_job_offers(self, request, pk=None):
         cv = self.get_object()
-        base_queryset = cv.matchings.select_related('job_offer').order_by('-score')
+        base_queryset = (cv.matchings
+                         .filter(score__isnull=False)
+                         .select_related('cv', 'job_offer')
+                         .defer(*MATCHING_LIST_DEFERRED_FIELDS))
         filterset = MatchingScoreFilter(data=request.query_params, queryset=base_queryset)
 
         if not filterset.is_valid():
@@ -107,7 +265,7 @@ class CVViewSet(LoggingModelViewSet):
         queryset = filterset.qs
 
         page = self.paginate_queryset(queryset)
-        serializer = CVMatchingSerializer(page or queryset, many=True)
+        serializer = CVMatchingListSerializer(page if page is not None else queryset, many=True)
 
         if page is not None:
             return self.get_paginated_response(serializer.data)